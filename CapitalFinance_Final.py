@@ -18,21 +18,25 @@ Features:
 
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 from io import BytesIO
 from datetime import datetime
 import qrcode
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image as RLImage, Table
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image as RLImage, Table, PageBreak, Flowable
+from reportlab.lib.styles import ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 import re
 import smtplib
+from contextlib import contextmanager
 from email.message import EmailMessage
 import urllib.parse
 import pandas as pd
 import numpy as np
+from emi_kernels import emi_vec, amortization_schedules
+import zipfile
 
 # Optional OCR imports
 OCR_AVAILABLE = True
@@ -42,43 +46,96 @@ try:
 except Exception:
     OCR_AVAILABLE = False
 
+# Optional PDF rasterisation (first page of PDF uploads for OCR; needs poppler)
+PDF2IMAGE_AVAILABLE = True
+try:
+    from pdf2image import convert_from_bytes
+except Exception:
+    PDF2IMAGE_AVAILABLE = False
+
+# Tesseract: LSTM engine only, one uniform block of text, capped image size
+OCR_CONFIG = "--oem 1 --psm 6"
+OCR_MAX_SIDE = 1600
+
+# Optional pypdf import (used to split batch-generated sanction letters)
+PYPDF_AVAILABLE = True
+try:
+    from pypdf import PdfReader, PdfWriter
+except Exception:
+    PYPDF_AVAILABLE = False
+
 # -------------------- Helper functions --------------------
+_PAN_RE = re.compile(r"[A-Z]{5}[0-9]{4}[A-Z]")
+_NON_DIGIT_RE = re.compile(r"\D")
+
 def is_valid_pan(pan: str) -> bool:
     """Validate Indian PAN format: 5 letters, 4 digits, 1 letter e.g. ABCDE1234F"""
-    return bool(re.fullmatch(r"[A-Z]{5}[0-9]{4}[A-Z]", (pan or "").strip().upper()))
+    return bool(_PAN_RE.fullmatch((pan or "").strip().upper()))
 
 def clean_mobile(mob: str) -> str:
     """Return only digits from mobile input"""
-    if not mob:
-        return ""
-    digits = re.sub(r"\D", "", mob)
-    # If leading country code 91 present and length > 10, strip it
-    if len(digits) > 10 and digits.endswith(digits[-10:]):
-        # keep last 10 digits
-        digits = digits[-10:]
-    return digits
+    digits = _NON_DIGIT_RE.sub("", mob or "")
+    # If leading country code (e.g. 91) present, keep last 10 digits
+    return digits[-10:] if len(digits) > 10 else digits
 
 def calculate_emi(principal: float, annual_rate: float, months: int) -> float:
-    """Standard EMI formula. returns monthly EMI (float)."""
+    """Standard EMI formula. returns monthly EMI (float), or an array of EMIs for array inputs."""
+    if np.ndim(principal) or np.ndim(annual_rate) or np.ndim(months):
+        P, rate, n = (np.ascontiguousarray(a, dtype=np.float64)
+                      for a in np.broadcast_arrays(principal, annual_rate, months))
+        return emi_vec(P.ravel(), rate.ravel(), n.ravel()).reshape(P.shape)
     if months <= 0:
         return 0.0
     r = annual_rate / 12.0 / 100.0
+    if r == 0:
+        return float(principal) / months
     try:
         emi = principal * r * (1 + r) ** months / ((1 + r) ** months - 1)
         return float(emi)
     except Exception:
         return 0.0
 
-def generate_qr_image_bytes(data: str) -> BytesIO:
-    """Return BytesIO containing PNG image of QR code."""
+def amortization_schedule(principal: float, annual_rate: float, months: int) -> pd.DataFrame:
+    """Month-wise interest / principal split of the EMI and the outstanding balance."""
+    if months <= 0 or annual_rate < 0:
+        return pd.DataFrame(columns=["Interest", "Principal", "Balance"])
+    emi = calculate_emi(principal, annual_rate, months)
+    r = annual_rate / 1200.0
+    paid = np.arange(months + 1, dtype=np.float64)
+    if r == 0:
+        balance = principal - emi * paid
+    else:
+        growth = (1.0 + r) ** paid
+        # closed-form outstanding balance after k payments, k = 0..months
+        balance = principal * growth - emi * (growth - 1.0) / r
+    interest = balance[:-1] * r
+    return pd.DataFrame({
+        "Interest": interest,
+        "Principal": emi - interest,
+        "Balance": np.maximum(balance[1:], 0.0),
+    }, index=pd.RangeIndex(1, months + 1, name="Month"))
+
+def batch_amortization(principal, annual_rate, months):
+    """Interest and principal matrices of shape (n_loans, max_months); months past a loan's tenure are 0."""
+    P = np.ascontiguousarray(principal, dtype=np.float64)
+    r = np.ascontiguousarray(annual_rate, dtype=np.float64)
+    N = np.ascontiguousarray(months, dtype=np.int64)
+    width = max(int(N.max()), 0) if N.size else 0
+    out_interest = np.zeros((P.shape[0], width))
+    out_principal = np.zeros((P.shape[0], width))
+    amortization_schedules(P, r, N, out_interest, out_principal)
+    return out_interest, out_principal
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def generate_qr_image_bytes(data: str) -> bytes:
+    """Return PNG image bytes of the QR code (cached per payload across reruns)."""
     qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=8, border=2)
     qr.add_data(data)
     qr.make(fit=True)
     img = qr.make_image(fill_color="black", back_color="white")
     bio = BytesIO()
     img.save(bio, format="PNG")
-    bio.seek(0)
-    return bio
+    return bio.getvalue()
 
 def compute_dummy_credit_score(salary_monthly: float, loan_amount: float, pan_ok: bool) -> float:
     """
@@ -121,14 +178,37 @@ def compute_dummy_credit_score(salary_monthly: float, loan_amount: float, pan_ok
     score = max(0.0, min(100.0, score))
     return round(score, 1)
 
+def compute_dummy_credit_scores(salary_monthly, loan_amount, pan_ok) -> np.ndarray:
+    """Vectorised compute_dummy_credit_score over arrays of applicants (same buckets, same 0-100 scale)."""
+    salary = np.maximum(np.nan_to_num(np.asarray(salary_monthly, dtype=np.float64)), 0.0)
+    annual_income = np.maximum(salary * 12.0, 1.0)
+    ltv = np.asarray(loan_amount, dtype=np.float64) / annual_income
+
+    score = np.full_like(salary, 50.0)
+    score += np.select([salary >= 200000, salary >= 100000, salary >= 50000, salary >= 25000], [20, 12, 6, 2], 0)
+    score += np.select([ltv < 0.4, ltv < 0.75, ltv < 1.25], [18, 6, -6], -15)
+    score += np.where(np.asarray(pan_ok, dtype=bool), 4, 0)
+    return np.clip(score, 0.0, 100.0).round(1)
+
 def try_ocr_extract_text(uploaded_file) -> str:
     """Try to run OCR on uploaded image/pdf and return extracted text or message."""
     if not OCR_AVAILABLE:
         return "OCR not available in this environment."
     try:
-        # PIL can open the uploaded file (Streamlit's UploadedFile behaves like a file)
-        img = Image.open(uploaded_file)
-        text = pytesseract.image_to_string(img)
+        if (getattr(uploaded_file, "name", "") or "").lower().endswith(".pdf"):
+            if not PDF2IMAGE_AVAILABLE:
+                return "PDF OCR not available (install pdf2image and poppler) — upload a JPG/PNG instead."
+            # ID / address proofs are practically always single-page
+            img = convert_from_bytes(uploaded_file.getvalue(), dpi=200, first_page=1, last_page=1)[0]
+        else:
+            # PIL can open the uploaded file (Streamlit's UploadedFile behaves like a file)
+            img = Image.open(uploaded_file)
+            # JPEG: let the decoder downscale (DCT scaling) instead of decoding full-size first
+            scale = OCR_MAX_SIDE / max(img.size)
+            if scale < 1:
+                img.draft(None, (int(img.width * scale), int(img.height * scale)))
+        img.thumbnail((OCR_MAX_SIDE, OCR_MAX_SIDE), Image.BILINEAR)
+        text = pytesseract.image_to_string(img, lang="eng", config=OCR_CONFIG)
         return text.strip() or "OCR ran but extracted no text."
     except Exception as e:
         return f"OCR failed: {str(e)}"
@@ -136,13 +216,45 @@ def try_ocr_extract_text(uploaded_file) -> str:
 def make_whatsapp_link(message: str, phone_number: str = "") -> str:
     """Return a wa.me link. phone_number optional (digits only)."""
     encoded = urllib.parse.quote(message)
-    phone = re.sub(r"\D", "", phone_number or "")
+    phone = _NON_DIGIT_RE.sub("", phone_number or "")
     if phone:
         return f"https://wa.me/{phone}?text={encoded}"
     return f"https://wa.me/?text={encoded}"
 
-def send_email_smtp(smtp_host, smtp_port, smtp_user, smtp_password, to_email, subject, body, attachment_bytes=None, attachment_name="Sanction_Letter.pdf"):
-    """Send email using SMTP (TLS). Returns (ok, message)."""
+def make_qr_payload(applicant: dict, loan_info: dict) -> str:
+    """Short sanction summary encoded into the letter's QR code."""
+    return (f"TATA|Applicant:{applicant['name']}|Mobile:{applicant['mobile']}|"
+            f"Loan:₹{loan_info['amount']:,}|Tenure:{loan_info['tenure']}m|EMI:₹{int(round(loan_info['emi'])):,}")
+
+def processing_fee_with_gst(base_fee: int = 1499) -> int:
+    """Processing fee inclusive of 18% GST."""
+    return base_fee + round(base_fee * 0.18)
+
+@contextmanager
+def smtp_session(smtp_host, smtp_port, smtp_user, smtp_password):
+    """
+    One authenticated SMTP connection for a batch of sends.
+    Port 465 uses implicit TLS (SMTP_SSL), any other port upgrades with STARTTLS.
+    """
+    use_ssl = int(smtp_port) == 465
+    if use_ssl:
+        server = smtplib.SMTP_SSL(smtp_host, smtp_port, timeout=20)
+    else:
+        server = smtplib.SMTP(smtp_host, smtp_port, timeout=20)
+    try:
+        if not use_ssl:
+            server.ehlo()
+            server.starttls()
+        server.login(smtp_user, smtp_password)
+        yield server
+    finally:
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+def send_email_smtp(smtp_host, smtp_port, smtp_user, smtp_password, to_email, subject, body, attachment_bytes=None, attachment_name="Sanction_Letter.pdf", session=None):
+    """Send email using SMTP (TLS). Reuses session (from smtp_session) when given. Returns (ok, message)."""
     try:
         msg = EmailMessage()
         msg['Subject'] = subject
@@ -151,55 +263,85 @@ def send_email_smtp(smtp_host, smtp_port, smtp_user, smtp_password, to_email, su
         msg.set_content(body)
         if attachment_bytes:
             msg.add_attachment(attachment_bytes, maintype='application', subtype='pdf', filename=attachment_name)
-        server = smtplib.SMTP(smtp_host, smtp_port, timeout=20)
-        server.ehlo()
-        server.starttls()
-        server.login(smtp_user, smtp_password)
-        server.send_message(msg)
-        server.quit()
+        if session is not None:
+            session.send_message(msg)
+        else:
+            with smtp_session(smtp_host, smtp_port, smtp_user, smtp_password) as server:
+                server.send_message(msg)
         return True, "Email sent successfully"
     except Exception as e:
         return False, f"Email failed: {str(e)}"
 
+# -------------------- HTTP --------------------
+@st.cache_resource(show_spinner=False)
+def get_http_session() -> requests.Session:
+    """Shared keep-alive HTTP session; its connection pool survives Streamlit reruns."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=10)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 # -------------------- PDF builder --------------------
-def build_sanction_pdf(applicant: dict, loan_info: dict, qr_bytes_io: BytesIO, pdf_title: str = "TATA CAPITAL FINANCE – LOAN APPROVAL LETTER") -> bytes:
-    """
-    Build a professional PDF with logo, table details and embedded QR code.
-    Returns raw PDF bytes.
-    applicant: {name, mobile, email, pan}
-    loan_info: {amount, roi, tenure, emi, processing_fee, net_disbursed, purpose, credit_score}
-    qr_bytes_io: BytesIO of QR PNG
-    """
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.8*inch, bottomMargin=0.8*inch, leftMargin=0.7*inch, rightMargin=0.7*inch)
-    story = []
-    styles = getSampleStyleSheet()
+LOGO_URL = "https://upload.wikimedia.org/wikipedia/commons/thumb/8/81/Tata_Capital_Logo.svg/512px-Tata_Capital_Logo.svg.png"
 
-    # Header: try get logo
+@st.cache_data(show_spinner=False)
+def _get_logo_bytes() -> bytes:
+    """Fetch the Tata Capital logo PNG (cached across reruns). Raises on failure so failures are not cached."""
+    resp = get_http_session().get(LOGO_URL, timeout=5)
+    resp.raise_for_status()
+    return resp.content
+
+def _fetch_logo():
+    """Logo PNG bytes, or None if it cannot be fetched right now (retried on the next letter build)."""
     try:
-        logo_url = "https://upload.wikimedia.org/wikipedia/commons/thumb/8/81/Tata_Capital_Logo.svg/512px-Tata_Capital_Logo.svg.png"
-        resp = requests.get(logo_url, timeout=5)
-        if resp.status_code == 200:
-            logo_img = RLImage(BytesIO(resp.content), width=2.6*inch, height=0.85*inch, hAlign='CENTER')
+        return _get_logo_bytes()
+    except Exception:
+        return None
+
+# Letter styles never vary, so they are built once and shared by every letter
+_TITLE_STYLE = ParagraphStyle(name="TitleStyle", fontSize=18, alignment=TA_CENTER, textColor=colors.HexColor('#0b3b61'), spaceAfter=6)
+_SUB_STYLE = ParagraphStyle(name="SubStyle", fontSize=14, alignment=TA_CENTER, textColor=colors.HexColor('#c8102e'), spaceAfter=12)
+_NORMAL_STYLE = ParagraphStyle(name='Normal', fontSize=10.5, leading=14)
+_NOTE_STYLE = ParagraphStyle(name='Note', fontSize=9.5, leading=13)
+_LOAN_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#c8102e')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10.5),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.gray),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 8),
+])
+_FOOTER_TABLE_STYLE = TableStyle([('VALIGN', (0,0), (-1,-1), 'TOP')])
+
+def _new_letter_doc(buffer: BytesIO) -> SimpleDocTemplate:
+    """A4 document template shared by single and batch sanction letters."""
+    return SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.8*inch, bottomMargin=0.8*inch, leftMargin=0.7*inch, rightMargin=0.7*inch)
+
+def _append_letter_story(story: list, applicant: dict, loan_info: dict, qr_bytes_io: BytesIO, pdf_title: str, logo_bytes=None):
+    """Append the flowables of one sanction letter (logo, details, table, QR footer) to story."""
+    # Header: logo when available
+    if logo_bytes:
+        try:
+            logo_img = RLImage(BytesIO(logo_bytes), width=2.6*inch, height=0.85*inch, hAlign='CENTER')
             story.append(logo_img)
             story.append(Spacer(1, 8))
-    except Exception:
-        pass
+        except Exception:
+            pass
 
     # Title
-    title_style = ParagraphStyle(name="TitleStyle", fontSize=18, alignment=TA_CENTER, textColor=colors.HexColor('#0b3b61'), spaceAfter=6)
-    sub_style = ParagraphStyle(name="SubStyle", fontSize=14, alignment=TA_CENTER, textColor=colors.HexColor('#c8102e'), spaceAfter=12)
-    story.append(Paragraph(pdf_title, title_style))
-    story.append(Paragraph("PERSONAL LOAN SANCTION LETTER (PROVISIONAL)", sub_style))
+    story.append(Paragraph(pdf_title, _TITLE_STYLE))
+    story.append(Paragraph("PERSONAL LOAN SANCTION LETTER (PROVISIONAL)", _SUB_STYLE))
     story.append(Spacer(1, 8))
 
     # Applicant details
-    normal = ParagraphStyle(name='Normal', fontSize=10.5, leading=14)
-    story.append(Paragraph(f"<b>Date:</b> {datetime.now().strftime('%d %B %Y')}", normal))
-    story.append(Paragraph(f"<b>Applicant:</b> {applicant.get('name','N/A')}", normal))
-    story.append(Paragraph(f"<b>Mobile:</b> {applicant.get('mobile','N/A')}  |  <b>Email:</b> {applicant.get('email','N/A')}", normal))
-    story.append(Paragraph(f"<b>PAN:</b> {applicant.get('pan','N/A')}", normal))
-    story.append(Paragraph(f"<b>Purpose:</b> {loan_info.get('purpose','N/A')}", normal))
+    story.append(Paragraph(f"<b>Date:</b> {datetime.now().strftime('%d %B %Y')}", _NORMAL_STYLE))
+    story.append(Paragraph(f"<b>Applicant:</b> {applicant.get('name','N/A')}", _NORMAL_STYLE))
+    story.append(Paragraph(f"<b>Mobile:</b> {applicant.get('mobile','N/A')}  |  <b>Email:</b> {applicant.get('email','N/A')}", _NORMAL_STYLE))
+    story.append(Paragraph(f"<b>PAN:</b> {applicant.get('pan','N/A')}", _NORMAL_STYLE))
+    story.append(Paragraph(f"<b>Purpose:</b> {loan_info.get('purpose','N/A')}", _NORMAL_STYLE))
     story.append(Spacer(1, 12))
 
     # Loan table
@@ -214,40 +356,99 @@ def build_sanction_pdf(applicant: dict, loan_info: dict, qr_bytes_io: BytesIO, p
         ['Credit Risk Score (0-100)', f"{loan_info.get('credit_score', 0)}"],
     ]
     table = Table(data, colWidths=[320, 180])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#c8102e')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10.5),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.whitesmoke),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.gray),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 8),
-    ]))
+    table.setStyle(_LOAN_TABLE_STYLE)
     story.append(table)
     story.append(Spacer(1, 12))
 
     # Note paragraph
     note_text = ("This sanction letter is provisional and subject to verification of documents, KYC, "
                  "credit underwriting and execution of loan documentation. Final terms will be as per the loan agreement.")
-    story.append(Paragraph(note_text, ParagraphStyle(name='Note', fontSize=9.5, leading=13)))
+    story.append(Paragraph(note_text, _NOTE_STYLE))
 
     story.append(Spacer(1, 20))
 
     # Footer with QR on right and signatory text left
     try:
         qr_img = RLImage(qr_bytes_io, width=1.6*inch, height=1.6*inch, hAlign='RIGHT')
-        footer_table = Table([[Paragraph("<b>Authorized Signatory</b><br/>Capital Finance", normal), qr_img]],
+        footer_table = Table([[Paragraph("<b>Authorized Signatory</b><br/>Capital Finance", _NORMAL_STYLE), qr_img]],
                              colWidths=[340, 120])
-        footer_table.setStyle(TableStyle([('VALIGN', (0,0), (-1,-1), 'TOP')]))
+        footer_table.setStyle(_FOOTER_TABLE_STYLE)
         story.append(footer_table)
     except Exception:
-        story.append(Paragraph("<b>Authorized Signatory</b><br/>Capital Finance", normal))
+        story.append(Paragraph("<b>Authorized Signatory</b><br/>Capital Finance", _NORMAL_STYLE))
 
+def build_sanction_pdf(applicant: dict, loan_info: dict, qr_bytes_io: BytesIO, pdf_title: str = "TATA CAPITAL FINANCE – LOAN APPROVAL LETTER") -> bytes:
+    """
+    Build a professional PDF with logo, table details and embedded QR code.
+    Returns raw PDF bytes.
+    applicant: {name, mobile, email, pan}
+    loan_info: {amount, roi, tenure, emi, processing_fee, net_disbursed, purpose, credit_score}
+    qr_bytes_io: BytesIO of QR PNG
+    """
+    buffer = BytesIO()
+    doc = _new_letter_doc(buffer)
+    story = []
+    _append_letter_story(story, applicant, loan_info, qr_bytes_io, pdf_title, logo_bytes=_fetch_logo())
     doc.build(story)
     buffer.seek(0)
     return buffer.read()
 
+class _LetterStart(Flowable):
+    """Zero-size marker that records the page number on which a letter starts."""
+    def __init__(self, key, starts: list):
+        Flowable.__init__(self)
+        self.key = key
+        self.starts = starts
+
+    def wrap(self, availWidth, availHeight):
+        return (0, 0)
+
+    def draw(self):
+        self.starts.append((self.key, self.canv.getPageNumber()))
+
+def build_sanction_pdfs_batch(applicants_and_loans, pdf_title: str = "TATA CAPITAL FINANCE – LOAN APPROVAL LETTER") -> dict:
+    """
+    Build many sanction letters in a single ReportLab pass and split the result per applicant.
+    applicants_and_loans: iterable of (applicant_id, applicant, loan_info, qr_bytes_io)
+    Returns {applicant_id: pdf_bytes}. Falls back to one build per letter if pypdf is missing.
+    """
+    items = list(applicants_and_loans)
+    if not items:
+        return {}
+    if len({item[0] for item in items}) != len(items):
+        raise ValueError("applicant ids must be unique")
+    if not PYPDF_AVAILABLE:
+        return {app_id: build_sanction_pdf(applicant, loan_info, qr_bio, pdf_title=pdf_title)
+                for app_id, applicant, loan_info, qr_bio in items}
+
+    buffer = BytesIO()
+    doc = _new_letter_doc(buffer)
+    story = []
+    starts = []
+    # One logo fetch for the whole batch, so an outage costs one timeout rather than one per letter
+    logo_bytes = _fetch_logo()
+    for k, (app_id, applicant, loan_info, qr_bio) in enumerate(items):
+        if k:
+            story.append(PageBreak())
+        story.append(_LetterStart(app_id, starts))
+        _append_letter_story(story, applicant, loan_info, qr_bio, pdf_title, logo_bytes=logo_bytes)
+    doc.build(story)
+
+    # Split the combined PDF back into per-applicant documents
+    buffer.seek(0)
+    reader = PdfReader(buffer)
+    total_pages = len(reader.pages)
+    pdfs = {}
+    for k, (app_id, first_page) in enumerate(starts):
+        last_page = starts[k + 1][1] if k + 1 < len(starts) else total_pages + 1
+        writer = PdfWriter()
+        for page_no in range(first_page, last_page):
+            writer.add_page(reader.pages[page_no - 1])
+        out = BytesIO()
+        writer.write(out)
+        pdfs[app_id] = out.getvalue()
+    return pdfs
+
 # -------------------- Streamlit UI layout & styling --------------------
 st.set_page_config(page_title="Capital Finance - Instant Sanction", layout="centered")
 # Custom CSS for Tata-themed gradient + card
@@ -292,67 +493,93 @@ st.markdown("<div class='card'>", unsafe_allow_html=True)
 st.sidebar.header("App Options & SMTP (optional)")
 with st.sidebar.expander("SMTP Settings (optional)"):
     smtp_host = st.text_input("SMTP Host", value="smtp.gmail.com")
-    smtp_port = st.number_input("SMTP Port", value=587)
+    smtp_port = st.number_input("SMTP Port", value=465, help="465 = SSL, 587 = STARTTLS")
     smtp_user = st.text_input("SMTP User (from email)")
     smtp_password = st.text_input("SMTP Password / App Password", type="password")
 st.sidebar.markdown("⚠ For Gmail use App Passwords when 2FA is enabled.")
 
 # Application form
 st.markdown("## Apply for Personal Loan")
-st.caption("Fill the form below. PDF will be generated only after accepting Terms & Conditions.")
-
-col1, col2 = st.columns([2,1])
-with col1:
-    name = st.text_input("Full Name", value="Sanjana Kushwah")
-    mobile = st.text_input("Mobile Number (10 digits)", value="6261511249")
-    email = st.text_input("Email ID", value="skushwah6261@gmail.com")
-    pan = st.text_input("PAN Number (ABCDE1234F)", value="ABCDE1234F").upper()
-    purpose = st.selectbox("Purpose of Loan", options=[
-        "Debt Consolidation", "Home Renovation", "Medical Expenses", "Education", "Business", "Wedding",
-        "Travel", "Vehicle Purchase", "Others"
-    ], index=1)
-    salary = st.number_input("Monthly Income (₹)", min_value=5000, max_value=2000000, value=60000, step=5000)
-with col2:
-    amount = st.number_input("Loan Amount (₹)", min_value=50000, max_value=5000000, value=200000, step=5000)
-    tenure = st.selectbox("Tenure (Months)", options=[12, 24, 36, 48, 60, 72, 84], index=1)
-    roi = st.number_input("Rate of Interest (%)", min_value=5.0, max_value=25.0, value=12.75, step=0.05)
-    agree = st.checkbox("I agree to Terms & Conditions and authorize Capital Finance to check my credit score", value=False)
-
-# Document upload
-st.subheader("Upload ID / Address Proof (optional)")
-uploaded_file = st.file_uploader("Upload JPG/PNG/PDF for OCR (optional)", type=["jpg", "jpeg", "png", "pdf"])
-ocr_text = ""
+st.caption("Fill the form below, then click Update Estimate or Generate Sanction Letter PDF. PDF will be generated only after accepting Terms & Conditions.")
+
+# Inputs live in a form so edits do not rerun the estimate / OCR until submitted
+with st.form("sanction_form"):
+    col1, col2 = st.columns([2,1])
+    with col1:
+        name = st.text_input("Full Name", value="Sanjana Kushwah")
+        mobile = st.text_input("Mobile Number (10 digits)", value="6261511249")
+        email = st.text_input("Email ID", value="skushwah6261@gmail.com")
+        pan = st.text_input("PAN Number (ABCDE1234F)", value="ABCDE1234F").upper()
+        purpose = st.selectbox("Purpose of Loan", options=[
+            "Debt Consolidation", "Home Renovation", "Medical Expenses", "Education", "Business", "Wedding",
+            "Travel", "Vehicle Purchase", "Others"
+        ], index=1)
+        salary = st.number_input("Monthly Income (₹)", min_value=5000, max_value=2000000, value=60000, step=5000)
+    with col2:
+        amount = st.number_input("Loan Amount (₹)", min_value=50000, max_value=5000000, value=200000, step=5000)
+        tenure = st.selectbox("Tenure (Months)", options=[12, 24, 36, 48, 60, 72, 84], index=1)
+        roi = st.number_input("Rate of Interest (%)", min_value=5.0, max_value=25.0, value=12.75, step=0.05)
+        agree = st.checkbox("I agree to Terms & Conditions and authorize Capital Finance to check my credit score", value=False)
+
+    # Document upload
+    st.subheader("Upload ID / Address Proof (optional)")
+    uploaded_file = st.file_uploader("Upload JPG/PNG/PDF for OCR (optional)", type=["jpg", "jpeg", "png", "pdf"])
+    # Both buttons submit the form, so Generate always uses what is currently entered
+    btn_col1, btn_col2 = st.columns(2)
+    with btn_col1:
+        submitted = st.form_submit_button("Update Estimate")
+    with btn_col2:
+        generate_clicked = st.form_submit_button("Generate Sanction Letter PDF")
+
+# Estimates & credit score are computed once per submit and reused on other reruns
+if submitted or generate_clicked or "estimate" not in st.session_state:
+    fee = processing_fee_with_gst()
+    st.session_state["estimate"] = {
+        "emi": calculate_emi(amount, roi, int(tenure)),
+        "processing_fee": fee,
+        "net_disbursed": max(int(amount - fee), 0),
+        "pan_ok": is_valid_pan(pan),
+        "credit_score": compute_dummy_credit_score(salary, amount, is_valid_pan(pan)),
+        "schedule": amortization_schedule(amount, roi, int(tenure)),
+    }
+estimate = st.session_state["estimate"]
+emi = estimate["emi"]
+processing_fee = estimate["processing_fee"]
+net_disbursed = estimate["net_disbursed"]
+credit_score = estimate["credit_score"]
+
 if uploaded_file is not None:
-    st.info("File uploaded. Attempting OCR (if available)...")
-    ocr_text = try_ocr_extract_text(uploaded_file)
-    st.text_area("OCR Extracted Text (best-effort)", value=ocr_text, height=160)
+    # OCR is the slowest step on the page, so it runs only when the uploaded file itself changes
+    if st.session_state.get("ocr_file_id") != uploaded_file.file_id:
+        st.session_state["ocr_text"] = try_ocr_extract_text(uploaded_file)
+        st.session_state["ocr_file_id"] = uploaded_file.file_id
+    st.text_area("OCR Extracted Text (best-effort)", value=st.session_state["ocr_text"], height=160)
 else:
     st.info("OCR is optional. If unavailable, this will not block PDF generation.")
 
 # PAN quick indicator
 if pan:
-    if is_valid_pan(pan):
+    if estimate["pan_ok"]:
         st.success("PAN format looks valid.")
     else:
         st.error("PAN format invalid. Correct format: ABCDE1234F")
 
 # Estimates & EMI
-processing_fee_base = 1499
-processing_fee = processing_fee_base + round(processing_fee_base * 0.18)
-net_disbursed = max(int(amount - processing_fee), 0)
-emi = calculate_emi(amount, roi, int(tenure))
 st.markdown("---")
 st.subheader("Estimate")
 st.write(f"🔹 Estimated EMI: ₹{int(round(emi)):,} / month")
 st.write(f"🔹 Processing Fee + GST: ₹{processing_fee:,}")
 st.write(f"🔹 Net Disbursed (approx): ₹{net_disbursed:,}")
 
-credit_score = compute_dummy_credit_score(salary, amount, is_valid_pan(pan))
+with st.expander("Amortization schedule"):
+    schedule = estimate["schedule"]
+    st.line_chart(schedule[["Interest", "Principal"]])
+    st.dataframe(schedule.round(2))
+
 st.write(f"🔸 Dummy Credit Risk Score: {credit_score} / 100")
 
 # ---------- Generation button with robust validation ----------
 st.markdown("---")
-st.write("Click to generate your provisional sanction letter (PDF).")
 
 def validate_inputs(name_val, mobile_val, email_val, agree_flag):
     errors = []
@@ -370,7 +597,7 @@ def validate_inputs(name_val, mobile_val, email_val, agree_flag):
         errors.append("Accept Terms & Conditions (checkbox)")
     return errors, name_clean, mobile_clean, email_clean
 
-if st.button("Generate Sanction Letter PDF"):
+if generate_clicked:
     errs, name_clean, mobile_clean, email_clean = validate_inputs(name, mobile, email, agree)
     if errs:
         st.error("Please fix the following fields before generating the letter: " + ", ".join(errs))
@@ -394,19 +621,18 @@ if st.button("Generate Sanction Letter PDF"):
         }
 
         # Prepare QR payload (short summary)
-        qr_payload = (f"TATA|Applicant:{applicant['name']}|Mobile:{applicant['mobile']}|"
-                      f"Loan:₹{loan_info['amount']:,}|Tenure:{loan_info['tenure']}m|EMI:₹{int(round(loan_info['emi'])):,}")
-        qr_bio = generate_qr_image_bytes(qr_payload)
+        qr_payload = make_qr_payload(applicant, loan_info)
+        qr_png = generate_qr_image_bytes(qr_payload)
 
         # Build PDF bytes
-        pdf_bytes = build_sanction_pdf(applicant, loan_info, qr_bio, pdf_title="TATA CAPITAL FINANCE – LOAN APPROVAL LETTER")
+        pdf_bytes = build_sanction_pdf(applicant, loan_info, BytesIO(qr_png), pdf_title="TATA CAPITAL FINANCE – LOAN APPROVAL LETTER")
 
         # Offer download
         st.success("Sanction letter generated successfully ✅")
         st.download_button("⬇ Download Sanction Letter (PDF)", pdf_bytes, file_name="Sanction_Letter.pdf", mime="application/pdf")
 
         # Show QR preview and WhatsApp message + code of the share text
-        st.image(qr_bio, caption="QR encoded sanction summary", width=180)
+        st.image(qr_png, caption="QR encoded sanction summary", width=180)
 
         wa_msg = (f"Hello, I ({applicant['name']}) have been provisionally sanctioned a loan of ₹{loan_info['amount']:,} "
                   f"for '{loan_info['purpose']}' with EMI ₹{int(round(loan_info['emi'])):,}/month for {loan_info['tenure']} months.")
@@ -429,6 +655,127 @@ if st.button("Generate Sanction Letter PDF"):
                     else:
                         st.error(sent_msg)
 
+# ---------- Bulk sanction letters from CSV ----------
+st.markdown("---")
+st.subheader("Bulk Sanction Letters (CSV)")
+BATCH_COLUMNS = ["name", "mobile", "email", "pan", "salary", "amount", "tenure", "roi"]
+st.caption("CSV columns: " + ", ".join(BATCH_COLUMNS) + " (optional: id, purpose). All letters are built in one PDF pass.")
+batch_file = st.file_uploader("Upload applicants CSV", type=["csv"], key="batch_csv")
+
+def validate_batch_frame(batch_df):
+    """Coerce numeric CSV columns in place; return a list of problems (row numbers are 1-based data rows)."""
+    problems = []
+    for col in ["salary", "amount", "tenure", "roi"]:
+        batch_df[col] = pd.to_numeric(batch_df[col], errors="coerce")
+        bad_rows = (batch_df.index[batch_df[col].isna()] + 1).tolist()
+        if bad_rows:
+            problems.append(f"'{col}' blank or not a number in rows {bad_rows}")
+    checks = [
+        ("amount", batch_df["amount"] <= 0, "must be > 0"),
+        ("roi", batch_df["roi"] <= 0, "must be > 0"),
+        ("tenure", (batch_df["tenure"] <= 0) | (batch_df["tenure"] % 1 != 0), "must be a whole number of months > 0"),
+    ]
+    for col, mask, rule in checks:
+        bad_rows = (batch_df.index[mask & batch_df[col].notna()] + 1).tolist()
+        if bad_rows:
+            problems.append(f"'{col}' {rule} (rows {bad_rows})")
+    # Same contact checks as the single-letter form (T&C acceptance does not apply to bulk rows)
+    for row_no, (name_val, mobile_val, email_val) in enumerate(
+            zip(*(batch_df[c].fillna("").astype(str) for c in ["name", "mobile", "email"])), start=1):
+        row_errors, _, _, _ = validate_inputs(name_val, mobile_val, email_val, True)
+        if row_errors:
+            problems.append(f"row {row_no} needs " + ", ".join(row_errors))
+    # Letters are keyed by id (row number when blank), so ids must not repeat
+    row_ids = pd.Series([str(n) for n in range(1, len(batch_df) + 1)], index=batch_df.index)
+    if "id" in batch_df.columns:
+        given = batch_df["id"].fillna("").astype(str).str.strip()
+        row_ids = given.where(given != "", row_ids)
+    dup_ids = sorted(set(row_ids[row_ids.duplicated(keep=False)]))
+    if dup_ids:
+        problems.append(f"duplicate ids {dup_ids}")
+    return problems
+
+if batch_file is not None and st.button("Generate Batch Sanction Letters"):
+    batch_df = pd.read_csv(batch_file, dtype={"id": str, "mobile": str, "pan": str})
+    missing_cols = [c for c in BATCH_COLUMNS if c not in batch_df.columns]
+    batch_problems = [] if missing_cols else validate_batch_frame(batch_df)
+    if missing_cols:
+        st.error("CSV is missing columns: " + ", ".join(missing_cols))
+    elif batch_problems:
+        st.error("Please fix the CSV before generating letters: " + "; ".join(batch_problems))
+    else:
+        batch_df = batch_df.fillna({"id": "", "name": "", "mobile": "", "email": "", "pan": "", "purpose": ""})
+        batch_df["pan"] = batch_df["pan"].str.strip().str.upper()
+        batch_scores = compute_dummy_credit_scores(batch_df["salary"], batch_df["amount"],
+                                                   [is_valid_pan(p) for p in batch_df["pan"]])
+        batch_emis = calculate_emi(batch_df["amount"], batch_df["roi"], batch_df["tenure"])
+        batch_interest, _ = batch_amortization(batch_df["amount"], batch_df["roi"], batch_df["tenure"])
+        batch_items = []
+        for row_no, (row, row_score, row_emi) in enumerate(zip(batch_df.to_dict("records"), batch_scores, batch_emis), start=1):
+            row_fee = processing_fee_with_gst()
+            b_applicant = {
+                "name": str(row["name"]).strip(),
+                "mobile": clean_mobile(str(row["mobile"])),
+                "email": str(row["email"]).strip(),
+                "pan": row["pan"]
+            }
+            b_loan_info = {
+                "amount": int(row["amount"]),
+                "roi": float(row["roi"]),
+                "tenure": int(row["tenure"]),
+                "emi": float(row_emi),
+                "processing_fee": row_fee,
+                "net_disbursed": max(int(row["amount"] - row_fee), 0),
+                "purpose": row.get("purpose") or "Others",
+                "credit_score": float(row_score)
+            }
+            app_id = str(row.get("id") or "").strip() or str(row_no)
+            b_qr = BytesIO(generate_qr_image_bytes(make_qr_payload(b_applicant, b_loan_info)))
+            batch_items.append((app_id, b_applicant, b_loan_info, b_qr))
+
+        batch_pdfs = build_sanction_pdfs_batch(batch_items)
+        # Keep letters across reruns so they can be emailed after generation
+        st.session_state["batch_letters"] = {app_id: (b_applicant, batch_pdfs[app_id])
+                                             for app_id, b_applicant, _, _ in batch_items}
+        st.success(f"Generated {len(batch_pdfs)} sanction letters ✅")
+        st.dataframe(pd.DataFrame({
+            "Applicant": [item[0] for item in batch_items],
+            "Name": [item[1]["name"] for item in batch_items],
+            "EMI (₹)": [round(item[2]["emi"], 2) for item in batch_items],
+            "Total Interest (₹)": batch_interest.sum(axis=1).round(2),
+            "Credit Score": batch_scores,
+        }))
+
+batch_letters = st.session_state.get("batch_letters")
+if batch_letters:
+    zip_buffer = BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for app_id, (_, b_pdf) in batch_letters.items():
+            zf.writestr(f"Sanction_Letter_{app_id}.pdf", b_pdf)
+    st.download_button("⬇ Download All Sanction Letters (ZIP)", zip_buffer.getvalue(), file_name="Sanction_Letters.zip", mime="application/zip")
+
+    if st.button(f"Email All {len(batch_letters)} Letters"):
+        if not (smtp_host and smtp_port and smtp_user and smtp_password):
+            st.error("Please fill SMTP details in the sidebar (host, port, user, password).")
+        else:
+            failures = []
+            try:
+                with smtp_session(smtp_host, int(smtp_port), smtp_user, smtp_password) as session:
+                    for app_id, (b_applicant, b_pdf) in batch_letters.items():
+                        sent_ok, sent_msg = send_email_smtp(
+                            smtp_host, int(smtp_port), smtp_user, smtp_password, b_applicant["email"],
+                            f"Sanction Letter — TATA CAPITAL FINANCE — {b_applicant['name']}",
+                            f"Dear {b_applicant['name']},\n\nPlease find attached your provisional sanction letter.\n\nRegards,\nTata Capital Finance",
+                            attachment_bytes=b_pdf, attachment_name="Sanction_Letter.pdf", session=session)
+                        if not sent_ok:
+                            failures.append(f"{app_id}: {sent_msg}")
+            except Exception as e:
+                failures.append(f"SMTP session failed: {str(e)}")
+            if failures:
+                st.error("Some emails were not sent: " + "; ".join(failures))
+            else:
+                st.success(f"Emailed {len(batch_letters)} sanction letters")
+
 # Footer close of card
 st.markdown("</div>", unsafe_allow_html=True)
 
@@ -437,6 +784,7 @@ st.markdown("---")
 st.markdown("""
 *Notes & Troubleshooting*
 - If OCR shows "not available", install pytesseract and the Tesseract binary on your machine.
+- For faster OCR image decode/resize, install pillow-simd in place of Pillow (same `PIL` API).
 - Email sending uses SMTP — for Gmail, use App Passwords if you have 2FA.
 - The credit score is a placeholder/computational heuristic — replace with production underwriting for real use.
 - QR encodes a short summary — do not include very sensitive data in the QR in production.
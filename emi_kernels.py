@@ -0,0 +1,54 @@
+# emi_kernels.py
+"""
+Numba kernels for the EMI / amortization maths of CapitalFinance_Final.py.
+They live in their own module so numba's on-disk cache (cache=True) always belongs to an
+importable module, whether the app runs under `streamlit run` or is imported by tests.
+numba is optional: without it the same functions run as plain per-element Python loops.
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except Exception:
+    prange = range
+
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+@njit(cache=True, fastmath=True)
+def emi_vec(P, r_annual, n):
+    """EMI kernel over 1-D float64 arrays of principal, annual rate (%) and tenure (months)."""
+    out = np.zeros(P.shape[0])
+    for i in range(P.shape[0]):
+        if n[i] <= 0:
+            continue
+        r = r_annual[i] / 1200.0
+        if r == 0.0:
+            out[i] = P[i] / n[i]
+        else:
+            pw = (1.0 + r) ** n[i]
+            out[i] = P[i] * r * pw / (pw - 1.0)
+    return out
+
+@njit(cache=True, parallel=True)
+def amortization_schedules(P, r_annual, N, out_interest, out_principal):
+    """Fill month-wise interest / principal (row per loan, column per month) for a batch of loans."""
+    for k in prange(P.shape[0]):
+        bal = P[k]
+        if N[k] <= 0:
+            continue
+        rk = r_annual[k] / 1200.0
+        if rk == 0.0:
+            emi = P[k] / N[k]
+        else:
+            pw = (1.0 + rk) ** N[k]
+            emi = P[k] * rk * pw / (pw - 1.0)
+        for i in range(N[k]):
+            inter = bal * rk
+            prin = emi - inter
+            out_interest[k, i] = inter
+            out_principal[k, i] = prin
+            bal -= prin
@@ -0,0 +1,18 @@
+import numpy as np
+
+import CapitalFinance_Final as app
+
+
+def test_batch_amortization_is_repeatable():
+    first_interest, first_principal = app.batch_amortization([200000, 100000], [12, 10], [24, 12])
+    second_interest, second_principal = app.batch_amortization([200000, 100000], [12, 10], [24, 12])
+    np.testing.assert_allclose(first_interest.sum(axis=1), [25952.67, 5499.06], atol=0.01)
+    np.testing.assert_allclose(second_interest, first_interest)
+    np.testing.assert_allclose(second_principal, first_principal)
+
+
+def test_batch_amortization_matches_single_schedule():
+    interest, principal = app.batch_amortization([200000], [12.75], [24])
+    schedule = app.amortization_schedule(200000, 12.75, 24)
+    np.testing.assert_allclose(interest[0], schedule["Interest"])
+    np.testing.assert_allclose(principal[0], schedule["Principal"])
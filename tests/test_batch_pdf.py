@@ -0,0 +1,41 @@
+from io import BytesIO
+
+import pandas as pd
+from pypdf import PdfReader
+
+import CapitalFinance_Final as app
+
+
+def _loan_info(amount):
+    return {
+        "amount": amount, "roi": 12.0, "tenure": 24, "emi": app.calculate_emi(amount, 12.0, 24),
+        "processing_fee": 1769, "net_disbursed": amount - 1769, "purpose": "Travel", "credit_score": 70.0,
+    }
+
+
+def test_batch_pdfs_split_per_applicant():
+    names = ["Asha Rao", "Bilal Khan", "Chitra Iyer"]
+    items = []
+    for k, name in enumerate(names):
+        applicant = {"name": name, "mobile": "987654321%d" % k, "email": "a%d@x.com" % k, "pan": "ABCDE1234F"}
+        qr = BytesIO(app.generate_qr_image_bytes(name))
+        items.append((str(k + 1), applicant, _loan_info(100000 * (k + 1)), qr))
+
+    pdfs = app.build_sanction_pdfs_batch(items)
+
+    assert list(pdfs) == ["1", "2", "3"]
+    for k, name in enumerate(names):
+        text = "".join(page.extract_text() for page in PdfReader(BytesIO(pdfs[str(k + 1)])).pages)
+        assert name in text
+        assert all(other not in text for other in names if other != name)
+
+
+def test_validate_batch_frame_reports_blank_contacts():
+    batch_df = pd.DataFrame({
+        "name": ["Asha Rao", None], "mobile": ["9876543210", None], "email": ["a@x.com", None],
+        "pan": ["ABCDE1234F", ""], "salary": [60000, 60000], "amount": [200000, 200000],
+        "tenure": [24, 24], "roi": [12.0, 12.0],
+    })
+    problems = app.validate_batch_frame(batch_df)
+    assert len(problems) == 1
+    assert problems[0].startswith("row 2 needs Full Name")
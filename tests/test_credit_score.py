@@ -0,0 +1,16 @@
+import itertools
+
+import numpy as np
+
+import CapitalFinance_Final as app
+
+
+def test_array_credit_scores_match_scalar():
+    # salaries on and around every bucket edge; loans giving LTVs on and around 0.4 / 0.75 / 1.25
+    salaries = [0, 24999, 25000, 49999, 50000, 99999, 100000, 199999, 200000, 500000]
+    ltvs = [0.0, 0.39, 0.4, 0.74, 0.75, 1.24, 1.25, 3.0]
+    rows = [(salary, ltv * max(salary * 12.0, 1.0), pan_ok)
+            for salary, ltv, pan_ok in itertools.product(salaries, ltvs, [True, False])]
+    salary, loan, pan_ok = zip(*rows)
+    expected = [app.compute_dummy_credit_score(*row) for row in rows]
+    np.testing.assert_allclose(app.compute_dummy_credit_scores(salary, loan, pan_ok), expected)
@@ -0,0 +1,21 @@
+import numpy as np
+
+import CapitalFinance_Final as app
+
+
+def test_array_emi_matches_scalar():
+    principal = [200000, 100000, 100000, 100000]
+    rate = [12.75, 0.0, 12.0, 10.0]
+    months = [24, 12, 0, 36]
+    expected = [app.calculate_emi(p, r, n) for p, r, n in zip(principal, rate, months)]
+    np.testing.assert_allclose(app.calculate_emi(principal, rate, months), expected)
+
+
+def test_zero_rate_and_zero_tenure():
+    assert app.calculate_emi(120000, 0, 12) == 10000.0
+    assert app.calculate_emi(120000, 12, 0) == 0.0
+    interest, principal = app.batch_amortization([120000, 50000], [0, 12], [12, 0])
+    assert np.isfinite(interest).all() and np.isfinite(principal).all()
+    np.testing.assert_allclose(principal[0], 10000.0)
+    np.testing.assert_allclose(interest, 0.0)
+    np.testing.assert_allclose(app.amortization_schedule(120000, 0, 12)["Balance"].iloc[-1], 0.0)
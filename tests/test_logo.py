@@ -0,0 +1,26 @@
+import CapitalFinance_Final as app
+
+
+class _Resp:
+    content = b"png-bytes"
+
+    def raise_for_status(self):
+        pass
+
+
+def test_failed_logo_fetch_is_not_cached(monkeypatch):
+    app._get_logo_bytes.clear()
+    calls = []
+
+    def flaky_get(url, timeout):
+        calls.append(url)
+        if len(calls) == 1:
+            raise ConnectionError("offline")
+        return _Resp()
+
+    monkeypatch.setattr(app.get_http_session(), "get", flaky_get)
+    assert app._fetch_logo() is None
+    assert app._fetch_logo() == b"png-bytes"
+    assert app._fetch_logo() == b"png-bytes"
+    assert len(calls) == 2
+    app._get_logo_bytes.clear()